@@ -1,51 +1,401 @@
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-from prometheus_flask_exporter import PrometheusMetrics
-from pythonjsonlogger import jsonlogger
+from array import array
+from flask import Flask, g, request
+from itertools import count
+from logging.handlers import QueueHandler, QueueListener
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from queue import SimpleQueue
+import atexit
+import copy
 import logging
-import uuid
+import orjson
 import os  
-from datetime import datetime
+import threading
+import time
 
 # Configuration constants
 APP_NAME = os.getenv('APP_NAME', 'DevOps Project API')
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 FLASK_ENV = os.getenv('FLASK_ENV', 'development')
+MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 64 * 1024))  # taille max d'un corps de requête (octets)
 API_VERSION = 'v1'
 
 # Configuration du logging structuré
+class OrjsonFormatter(logging.Formatter):
+    """
+    Format log records as one JSON object per line using orjson.
+    
+    Emits the same fields as the previous python-json-logger setup
+    (asctime, name, levelname, message, request_id) plus the optional
+    extras passed by the request handlers.
+    """
+    
+    EXTRA_FIELDS = ('method', 'path', 'item_id')
+    
+    def format(self, record):
+        log = {
+            "asctime": self.formatTime(record),
+            "name": record.name,
+            "levelname": record.levelname,
+            "message": record.getMessage(),
+            "request_id": getattr(record, 'request_id', None)
+        }
+        for field in self.EXTRA_FIELDS:
+            if field in record.__dict__:
+                log[field] = record.__dict__[field]
+        if record.exc_info:
+            log["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            log["stack_info"] = self.formatStack(record.stack_info)
+        return orjson.dumps(log).decode()
+
 logHandler = logging.StreamHandler()
-formatter = jsonlogger.JsonFormatter(
-    '%(asctime)s %(name)s %(levelname)s %(message)s %(request_id)s'
-)
-logHandler.setFormatter(formatter)
+logHandler.setFormatter(OrjsonFormatter())
+
+# Les requêtes ne font que mettre les logs en file ; un thread dédié les écrit sur stderr
+class LocalQueueHandler(QueueHandler):
+    """
+    QueueHandler for an in-process queue.
+    
+    The stock prepare() formats the record and folds the traceback into
+    the message so it can be pickled. Records never leave the process
+    here, so only the message arguments are merged; exc_info and
+    stack_info are kept for OrjsonFormatter to emit as separate fields.
+    """
+    
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+queueHandler = LocalQueueHandler(SimpleQueue())
+log_listener = None
+
+def _start_log_listener():
+    # Un processus forké (ex. gunicorn --preload) n'hérite pas du thread d'écriture :
+    # on lui donne une file et un listener neufs
+    global log_listener
+    queueHandler.queue = SimpleQueue()
+    log_listener = QueueListener(queueHandler.queue, logHandler, respect_handler_level=True)
+    log_listener.start()
+
+def _stop_log_listener():
+    log_listener.stop()
+
+_start_log_listener()
+os.register_at_fork(after_in_child=_start_log_listener)
+atexit.register(_stop_log_listener)
+
 logger = logging.getLogger()
-logger.addHandler(logHandler)
+logger.addHandler(queueHandler)
 logger.setLevel(getattr(logging, LOG_LEVEL.upper()))
 
 # Initialisation Flask
 app = Flask(__name__)
-CORS(app)
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+
+# En-têtes CORS statiques (API publique, toutes origines autorisées).
+# If-None-Match et ETag permettent aux clients navigateur d'utiliser les 304.
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, HEAD, POST, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, If-None-Match",
+    "Access-Control-Expose-Headers": "ETag"
+}
+
+@app.after_request
+def add_cors_headers(response):
+    response.headers.update(CORS_HEADERS)
+    return response
+
+# Métriques Prometheus (mêmes noms que prometheus_flask_exporter, mesurées par une
+# seule paire de hooks before/after_request au lieu d'un wrapper par endpoint)
+METRICS_PATH = '/metrics'
+REQUEST_DURATION = Histogram(
+    'flask_http_request_duration_seconds',
+    'Flask HTTP request duration in seconds',
+    ('method', 'path', 'status')
+)
+REQUEST_TOTAL = Counter(
+    'flask_http_request_total',
+    'Total number of HTTP requests',
+    ('method', 'status')
+)
+REQUEST_EXCEPTIONS = Counter(
+    'flask_http_request_exceptions_total',
+    'Total number of HTTP requests which resulted in an exception',
+    ('method', 'status')
+)
+
+@app.before_request
+def start_timer():
+    g.start_ns = time.monotonic_ns()
+
+@app.after_request
+def record_request_metrics(response):
+    start_ns = g.get('start_ns')
+    if start_ns is not None and request.path != METRICS_PATH:
+        status = str(response.status_code)
+        REQUEST_DURATION.labels(request.method, request.path, status).observe(
+            (time.monotonic_ns() - start_ns) / 1e9
+        )
+        REQUEST_TOTAL.labels(request.method, status).inc()
+    return response
+
+@app.teardown_request
+def record_request_exception(exception=None):
+    # Exceptions non gérées : la réponse 500 est déjà comptée par after_request
+    if exception is not None and request.path != METRICS_PATH:
+        REQUEST_EXCEPTIONS.labels(request.method, '500').inc()
+
+@app.route(METRICS_PATH, methods=['GET'])
+def metrics():
+    """
+    Expose Prometheus metrics.
+    
+    Returns:
+        Response: Metrics in the Prometheus text format, HTTP 200
+    """
+    return app.response_class(generate_latest(), status=200, content_type=CONTENT_TYPE_LATEST)
+
+# Sérialisation JSON via orjson (plus rapide que le json de la stdlib utilisé par jsonify)
+def orjson_response(obj, status=200):
+    """
+    Build a JSON response serialized with orjson.
+    
+    Args:
+        obj: JSON-serializable object
+        status (int): HTTP status code
+        
+    Returns:
+        Response: application/json response
+    """
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+# Réponses d'erreur constantes, encodées une seule fois : (corps, code HTTP)
+ERR_ITEM_NOT_FOUND = (orjson.dumps({"error": "Item not found"}), 404)
+ERR_UNSUPPORTED_MEDIA_TYPE = (orjson.dumps({"error": "Content-Type must be application/json"}), 415)
+ERR_INVALID_JSON = (orjson.dumps({"error": "Request body must be valid JSON"}), 400)
+ERR_BODY_TOO_LARGE = (orjson.dumps({"error": "Request body is too large"}), 413)
+ERR_BODY_REQUIRED = (orjson.dumps({"error": "Request body is required"}), 400)
+ERR_BODY_NOT_OBJECT = (orjson.dumps({"error": "Request body must be a JSON object"}), 400)
+ERR_NAME_REQUIRED = (orjson.dumps({"error": "Name is required"}), 400)
+ERR_INVALID_NAME = (orjson.dumps({"error": "Name must be a non-empty string"}), 400)
+ERR_INVALID_DESCRIPTION = (orjson.dumps({"error": "Description must be a string"}), 400)
+ERR_ENDPOINT_NOT_FOUND = (orjson.dumps({"error": "Endpoint not found"}), 404)
+ERR_INTERNAL = (orjson.dumps({"error": "Internal server error"}), 500)
+
+def error_response(error):
+    """
+    Build a JSON error response from a pre-encoded (body, status) pair.
+    
+    Returns:
+        Response: application/json error response
+    """
+    body, status = error
+    return app.response_class(body, status=status, mimetype='application/json')
+
+# Horodatage ISO 8601 (UTC, à la seconde) mis en cache pour la seconde en cours
+_ts_cache = (0, '')
+
+def now_iso():
+    """
+    Current UTC time formatted as ISO 8601 with second resolution.
+    
+    The formatted string is cached and only rebuilt when the second changes.
+    
+    Returns:
+        str: Timestamp such as "2026-01-15T12:00:00"
+    """
+    global _ts_cache
+    t = int(time.time())
+    cached = _ts_cache
+    if cached[0] != t:
+        cached = _ts_cache = (t, time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(t)))
+    return cached[1]
 
-# Métriques Prometheus
-metrics = PrometheusMetrics(app, group_by='path')
+# Base de données en mémoire (une liste par champ : structure of arrays)
+class ItemStore:
+    """
+    In-memory item storage keeping one parallel list per field.
+    
+    Rows are only materialized as dicts when they are returned to a client.
+    IDs are kept in a typed array (8 bytes each) rather than a list of int
+    objects. All access goes through a lock so the store can be shared by
+    the threads of a Gunicorn gthread worker.
+    """
+    
+    def __init__(self, first_id=1):
+        self.ids = array('q')
+        self.names = []
+        self.descriptions = []
+        self.created_ats = []
+        self.rows = {}  # id -> position dans les colonnes
+        self.version = 0  # incrémentée à chaque modification
+        self._lock = threading.Lock()
+        self._next_ids = count(first_id)
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def _row(self, row):
+        return {
+            "id": self.ids[row],
+            "name": self.names[row],
+            "description": self.descriptions[row],
+            "created_at": self.created_ats[row]
+        }
+    
+    def add(self, name, description, created_at):
+        """
+        Append a new item under the next available ID.
+        
+        Returns:
+            dict: The stored item
+        """
+        with self._lock:
+            item_id = next(self._next_ids)
+            self.rows[item_id] = len(self.ids)
+            self.ids.append(item_id)
+            self.names.append(name)
+            self.descriptions.append(description)
+            self.created_ats.append(created_at)
+            self.version += 1
+            return self._row(len(self.ids) - 1)
+    
+    def get(self, item_id):
+        """
+        Look up an item by ID through the id -> row index.
+        
+        Returns:
+            dict | None: The item with this ID, or None if it does not exist
+        """
+        with self._lock:
+            row = self.rows.get(item_id)
+            return None if row is None else self._row(row)
+    
+    def delete(self, item_id):
+        """
+        Remove an item in O(1) by moving the last row into its slot.
+        
+        Returns:
+            bool: True if the item existed and was removed
+        """
+        with self._lock:
+            row = self.rows.pop(item_id, None)
+            if row is None:
+                return False
+            last = len(self.ids) - 1
+            if row != last:
+                moved_id = self.ids[row] = self.ids[last]
+                self.names[row] = self.names[last]
+                self.descriptions[row] = self.descriptions[last]
+                self.created_ats[row] = self.created_ats[last]
+                self.rows[moved_id] = row
+            self.ids.pop()
+            self.names.pop()
+            self.descriptions.pop()
+            self.created_ats.pop()
+            self.version += 1
+            return True
+    
+    def to_list(self):
+        """
+        Materialize every row as a dict.
+        
+        Returns:
+            list[dict]: All items (insertion order until an item is deleted)
+        """
+        with self._lock:
+            return [
+                {"id": i, "name": n, "description": d, "created_at": c}
+                for i, n, d, c in zip(self.ids, self.names, self.descriptions, self.created_ats)
+            ]
+
+items_db = ItemStore()
+items_db.add("Item 1", "First item", now_iso())
+items_db.add("Item 2", "Second item", now_iso())
+
+# Génération des request_id à partir d'un tampon d'aléa par thread
+REQUEST_ID_BYTES = 16
+RANDOM_BUFFER_SIZE = 4096  # 256 request_id par appel à os.urandom
+_random_state = threading.local()
 
-# Base de données en mémoire (simple liste)
-items_db = [
-    {"id": 1, "name": "Item 1", "description": "First item", "created_at": datetime.now().isoformat()},
-    {"id": 2, "name": "Item 2", "description": "Second item", "created_at": datetime.now().isoformat()}
-]
-next_id = 3
+def _reset_random_state():
+    # Un processus forké ne doit pas réutiliser le tampon de son parent
+    global _random_state
+    _random_state = threading.local()
+
+os.register_at_fork(after_in_child=_reset_random_state)
+
+def new_request_id():
+    """
+    Generate a random 32-character hex request ID.
+    
+    Randomness is read from os.urandom in 4 KB batches per thread instead
+    of once per request as uuid.uuid4() does.
+    
+    Returns:
+        str: Hex-encoded 128-bit random ID
+    """
+    state = _random_state
+    buf = getattr(state, 'buf', b'')
+    pos = getattr(state, 'pos', 0)
+    if pos >= len(buf):
+        buf = state.buf = os.urandom(RANDOM_BUFFER_SIZE)
+        pos = 0
+    state.pos = pos + REQUEST_ID_BYTES
+    return buf[pos:pos + REQUEST_ID_BYTES].hex()
+
+# ETag faible dérivé de la version de items_db ; le préfixe aléatoire évite
+# qu'un redémarrage (ou un autre pod) réutilise les mêmes numéros de version
+_ETAG_PREFIX = os.urandom(4).hex()
+
+def items_etag(version, item_id=None):
+    """
+    Build the opaque ETag value (without W/ and quotes) of the item list, or
+    of a single item when item_id is given.
+    
+    Returns:
+        str: ETag value to pass to Response.set_etag(..., weak=True)
+    """
+    etag = f'{_ETAG_PREFIX}-{version}'
+    return etag if item_id is None else f'{etag}-{item_id}'
+
+def not_modified(etag):
+    """
+    Check If-None-Match against an ETag using HTTP's weak comparison
+    (handles "*", lists of ETags, and the weak or strong form).
+    
+    Returns:
+        Response | None: Empty 304 response if the client's copy is current
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+# Corps sérialisé de GET /api/items, sous la forme (version de items_db, bytes, ETag)
+_items_cache = (-1, b'', '')
 
 # Middleware pour ajouter request_id à chaque requête
 @app.before_request
 def before_request():
-    request.request_id = str(uuid.uuid4())
-    logger.info(f"Incoming request", extra={
-        'request_id': request.request_id,
-        'method': request.method,
-        'path': request.path
-    })
+    request.request_id = new_request_id()
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Incoming request", extra={
+            'request_id': request.request_id,
+            'method': request.method,
+            'path': request.path
+        })
+
+# Partie statique de la réponse /health, encodée une seule fois (sans le '}' final)
+_HEALTH_STATIC = orjson.dumps({
+    "status": "healthy",
+    "service": APP_NAME,
+    "version": API_VERSION
+})[:-1]
 
 # Health check endpoint
 @app.route('/health', methods=['GET'])
@@ -53,15 +403,14 @@ def health():
     """
     Health check endpoint to verify API availability.
     
+    Only the timestamp varies between calls, so it is spliced into the
+    pre-encoded static body instead of re-serializing the whole payload.
+    
     Returns:
-        tuple: JSON response with status and timestamp, HTTP 200
+        Response: JSON response with status and timestamp, HTTP 200
     """
-    return jsonify({
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "service": APP_NAME,
-        "version": API_VERSION
-    }), 200
+    body = _HEALTH_STATIC + b',"timestamp":"' + now_iso().encode() + b'"}'
+    return app.response_class(body, status=200, mimetype='application/json')
 
 # GET all items
 @app.route('/api/items', methods=['GET'])
@@ -69,14 +418,29 @@ def get_items():
     """
     Retrieve all items from the database.
     
+    The serialized body is cached until items_db is modified, and clients
+    sending a matching If-None-Match get an empty 304 instead.
+    
     Returns:
-        tuple: JSON response with items list and count, HTTP 200
+        Response: JSON response with items list and count, HTTP 200 or 304
     """
-    logger.info("Fetching all items", extra={'request_id': request.request_id})
-    return jsonify({
-        "items": items_db,
-        "count": len(items_db)
-    }), 200
+    global _items_cache
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Fetching all items", extra={'request_id': request.request_id})
+    cached = _items_cache
+    if cached[0] != items_db.version:
+        version = items_db.version
+        items = items_db.to_list()
+        cached = _items_cache = (version, orjson.dumps({
+            "items": items,
+            "count": len(items)
+        }), items_etag(version))
+    response = not_modified(cached[2])
+    if response is not None:
+        return response
+    response = app.response_class(cached[1], status=200, mimetype='application/json')
+    response.set_etag(cached[2], weak=True)
+    return response
 
 # GET item by ID
 @app.route('/api/items/<int:item_id>', methods=['GET'])
@@ -88,17 +452,27 @@ def get_item(item_id: int):
         item_id (int): The ID of the item to retrieve
         
     Returns:
-        tuple: JSON response with item data or error, HTTP 200 or 404
+        Response: JSON response with item data or error, HTTP 200, 304 or 404
     """
-    logger.info(f"Fetching item {item_id}", extra={'request_id': request.request_id})
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Fetching item %d", item_id, extra={'request_id': request.request_id})
     
-    item = next((item for item in items_db if item["id"] == item_id), None)
+    # Version lue avant l'item : au pire l'ETag est plus ancien que le contenu
+    version = items_db.version
+    item = items_db.get(item_id)
     
     if item is None:
-        logger.warning(f"Item {item_id} not found", extra={'request_id': request.request_id})
-        return jsonify({"error": "Item not found"}), 404
+        logger.warning("Item %d not found", item_id, extra={'request_id': request.request_id})
+        return error_response(ERR_ITEM_NOT_FOUND)
+    
+    etag = items_etag(version, item_id)
+    response = not_modified(etag)
+    if response is not None:
+        return response
     
-    return jsonify(item), 200
+    response = orjson_response(item, 200)
+    response.set_etag(etag, weak=True)
+    return response
 
 # POST create new item
 @app.route('/api/items', methods=['POST'])
@@ -107,76 +481,84 @@ def create_item():
     Create a new item with validation.
     
     Returns:
-        tuple: JSON response with created item or error, HTTP 201 or 400
+        Response: JSON response with created item or error, HTTP 201, 400 or 415
     """
-    global next_id
+    if not request.is_json:
+        logger.error("Unsupported content type", extra={'request_id': request.request_id})
+        return error_response(ERR_UNSUPPORTED_MEDIA_TYPE)
     
-    data = request.get_json()
+    # Parse the raw body with orjson; the body is not needed again, so don't cache it.
+    # Its size is capped by MAX_CONTENT_LENGTH, and orjson >= 3.9.15 rejects
+    # nesting deeper than 1024 levels with a JSONDecodeError.
+    try:
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        logger.error("Invalid JSON body", extra={'request_id': request.request_id})
+        return error_response(ERR_INVALID_JSON)
     
-    # Validate request body exists
+    # Validate request body exists and is a JSON object
     if not data:
         logger.error("Empty request body", extra={'request_id': request.request_id})
-        return jsonify({"error": "Request body is required"}), 400
+        return error_response(ERR_BODY_REQUIRED)
+    
+    if not isinstance(data, dict):
+        logger.error("Request body is not a JSON object", extra={'request_id': request.request_id})
+        return error_response(ERR_BODY_NOT_OBJECT)
     
-    # Validate required fields
-    if 'name' not in data:
+    # Validate required fields (one lookup per field)
+    name = data.get('name')
+    if name is None:
         logger.error("Missing required field: name", extra={'request_id': request.request_id})
-        return jsonify({"error": "Name is required"}), 400
+        return error_response(ERR_NAME_REQUIRED)
     
     # Validate field types and constraints
-    if not isinstance(data['name'], str) or len(data['name'].strip()) == 0:
+    if not isinstance(name, str) or not (name := name.strip()):
         logger.error("Invalid name field", extra={'request_id': request.request_id})
-        return jsonify({"error": "Name must be a non-empty string"}), 400
+        return error_response(ERR_INVALID_NAME)
     
-    if 'description' in data and not isinstance(data['description'], str):
+    description = data.get('description', '')
+    if not isinstance(description, str):
         logger.error("Invalid description field", extra={'request_id': request.request_id})
-        return jsonify({"error": "Description must be a string"}), 400
+        return error_response(ERR_INVALID_DESCRIPTION)
     
-    new_item = {
-        "id": next_id,
-        "name": data['name'].strip(),
-        "description": data.get('description', '').strip(),
-        "created_at": datetime.now().isoformat()
-    }
+    new_item = items_db.add(name, description.strip(), now_iso())
     
-    items_db.append(new_item)
-    next_id += 1
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Created item %d", new_item['id'], extra={
+            'request_id': request.request_id,
+            'item_id': new_item['id']
+        })
     
-    logger.info(f"Created item {new_item['id']}", extra={
-        'request_id': request.request_id,
-        'item_id': new_item['id']
-    })
-    
-    return jsonify(new_item), 201
+    return orjson_response(new_item, 201)
 
 # DELETE item by ID
 @app.route('/api/items/<int:item_id>', methods=['DELETE'])
 def delete_item(item_id):
-    global items_db
-    
-    logger.info(f"Deleting item {item_id}", extra={'request_id': request.request_id})
-    
-    item = next((item for item in items_db if item["id"] == item_id), None)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Deleting item %d", item_id, extra={'request_id': request.request_id})
     
-    if item is None:
-        logger.warning(f"Item {item_id} not found for deletion", extra={'request_id': request.request_id})
-        return jsonify({"error": "Item not found"}), 404
-    
-    items_db = [item for item in items_db if item["id"] != item_id]
+    if not items_db.delete(item_id):
+        logger.warning("Item %d not found for deletion", item_id, extra={'request_id': request.request_id})
+        return error_response(ERR_ITEM_NOT_FOUND)
     
-    logger.info(f"Deleted item {item_id}", extra={'request_id': request.request_id})
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Deleted item %d", item_id, extra={'request_id': request.request_id})
     
-    return jsonify({"message": f"Item {item_id} deleted successfully"}), 200
+    return orjson_response({"message": f"Item {item_id} deleted successfully"}, 200)
 
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
-    return jsonify({"error": "Endpoint not found"}), 404
+    return error_response(ERR_ENDPOINT_NOT_FOUND)
+
+@app.errorhandler(413)
+def request_entity_too_large(error):
+    return error_response(ERR_BODY_TOO_LARGE)
 
 @app.errorhandler(500)
 def internal_error(error):
     logger.error("Internal server error", extra={'request_id': getattr(request, 'request_id', 'unknown')})
-    return jsonify({"error": "Internal server error"}), 500
+    return error_response(ERR_INTERNAL)
 
 if __name__ == '__main__':
     